@@ -492,6 +492,16 @@ class Battery(ABC):
         """
         return False
 
+    def get_can_filters(self) -> Union[List[dict], None]:
+        """
+        Each CAN driver may override this function to provide the CAN filters for the frames it needs.
+        The filters are applied in the kernel, once all batteries on the CAN port were found and
+        every one of them provides filters. Else all frames are received.
+
+        :return: list of python-can filter dicts or None, if all frames should be received
+        """
+        return None
+
     def set_can_transport_interface(self, can_transport_interface: object) -> None:
         """
         Set the access object for the can interface.
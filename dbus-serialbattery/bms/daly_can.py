@@ -19,12 +19,54 @@ from utils import (
     MAX_BATTERY_DISCHARGE_CURRENT,
     MIN_CELL_VOLTAGE,
 )
-from struct import unpack_from, pack_into
+from struct import Struct
+from typing import List
 from time import time
 import sys
 from can import Message, CanOperationError
 from time import sleep
 
+# precompiled frame layouts, the format strings are parsed only once at import
+_S_STATUS = Struct(">BB??BHx")
+_S_SOC = Struct(">HHHH")
+_S_CELL = Struct(">BHHHx")
+_S_MINMAX_V = Struct(">hbhb")
+_S_FET = Struct(">b??BL")
+_S_SETTINGS = Struct(">LL")
+_S_WRITE_SOC = Struct(">Hxxxxxx")
+
+# plausibility limits, derived from the config only once
+_CRNT_MIN_VALID = -(MAX_BATTERY_DISCHARGE_CURRENT * 2.1)
+_CRNT_MAX_VALID = MAX_BATTERY_CHARGE_CURRENT * 1.3
+# half of MIN_CELL_VOLTAGE in mV, compared to the raw values to skip the division for invalid cells
+_CELL_LOW_MIN_MV = MIN_CELL_VOLTAGE * 500
+
+
+def _alarm_lut(alarm_mask: int, warning_mask: int) -> bytes:
+    """
+    Build a lookup table which maps an alarm byte to the protection level
+
+    :param alarm_mask: bits which signal an alarm
+    :param warning_mask: bits which signal a warning (pre-alarm)
+    :return: 256 entries with 2 = alarm, 1 = warning, 0 = ok
+    """
+    return bytes(2 if value & alarm_mask else 1 if value & warning_mask else 0 for value in range(256))
+
+
+# alarm masks, all bits of a level are combined into a single mask, so one AND decides the level
+# alarm byte 0: voltage
+_LUT_HIGH_VOLTAGE = _alarm_lut(0x30, 0x0F)
+_LUT_LOW_VOLTAGE = _alarm_lut(0x80, 0x40)
+# alarm byte 1: temperature
+_LUT_HIGH_CHARGE_TEMP = _alarm_lut(0x02, 0x01)
+_LUT_LOW_CHARGE_TEMP = _alarm_lut(0x08, 0x04)
+_LUT_HIGH_DISCHARGE_TEMP = _alarm_lut(0x20, 0x10)
+_LUT_LOW_DISCHARGE_TEMP = _alarm_lut(0x80, 0x40)
+# alarm byte 2: current and SoC
+# high charge (0x02/0x01) and high discharge (0x08/0x04) current are both mapped to high_charge_current
+_LUT_HIGH_CURRENT = _alarm_lut(0x0A, 0x05)
+_LUT_LOW_SOC = _alarm_lut(0x80, 0x40)
+
 
 class Daly_Can(Battery):
     def __init__(self, port, baud, address):
@@ -37,68 +79,83 @@ class Daly_Can(Battery):
         self.cell_max_no = None
         # self.cell_count = 0  # init here if testing with bms without battery connected
         self.poll_interval = 1000
-        self.poll_step = 0
         self.type = self.BATTERYTYPE
         self.has_settings = True
         self.reset_soc = 0
         self.soc_to_set = None
         self.last_charge_mode = self.charge_mode
+        self.hardware_version_cell_count = None
 
         self.can_bus = None
         self.device_address = int.from_bytes(address, byteorder="big") if address is not None else 0x01
+        # the request frames never change, so build them only once instead of on every refresh
+        self.request_messages = [
+            Message(arbitration_id=(command & 0xFFFF00FF) | (self.device_address << 8), data=bytearray(8)) for command in self.REQUEST_COMMANDS
+        ]
+        # map the response ids of this device address to the ids of the default address, so
+        # read_daly_can() can look up the cached frames directly instead of normalizing every id
+        response_ids = list(self.RESPONSE_IDS)
+        # cell voltage frames are re-keyed with the frame number (1 based) by the receive thread
+        response_ids += [self.CELL_VOLTS_ID_MIN + (frame << 16) for frame in range(1, self.CELL_VOLTS_FRAMES + 1)]
+        self.response_ids = {(response_id & 0xFFFFFF00) | self.device_address: response_id for response_id in response_ids}
         self.error_active = False
         self.last_error_time = 0
         self.history.exclude_values_to_calculate = ["charge_cycles"]
 
-    COMMAND_BASE = "COMMAND_BASE"
-    COMMAND_SOC = "COMMAND_SOC"
-    COMMAND_MINMAX_CELL_VOLTS = "COMMAND_MINMAX_CELL_VOLTS"
-    COMMAND_MINMAX_TEMP = "COMMAND_MINMAX_TEMP"
-    COMMAND_FET = "COMMAND_FET"
-    COMMAND_STATUS = "COMMAND_STATUS"
-    COMMAND_CELL_VOLTS = "COMMAND_CELL_VOLTS"
-    COMMAND_TEMP = "COMMAND_TEMP"
-    COMMAND_CELL_BALANCE = "COMMAND_CELL_BALANCE"
-    COMMAND_ALARM = "COMMAND_ALARM"
-    COMMAND_SETTINGS = "COMMAND_SETTINGS"
-
-    RESPONSE_BASE = "RESPONSE_BASE"
-    RESPONSE_SOC = "RESPONSE_SOC"
-    RESPONSE_MINMAX_CELL_VOLTS = "RESPONSE_MINMAX_CELL_VOLTS"
-    RESPONSE_MINMAX_TEMP = "RESPONSE_MINMAX_TEMP"
-    RESPONSE_FET = "RESPONSE_FET"
-    RESPONSE_STATUS = "RESPONSE_STATUS"
-    RESPONSE_CELL_VOLTS = "RESPONSE_CELL_VOLTS"
-    RESPONSE_TEMP = "RESPONSE_TEMP"
-    RESPONSE_CELL_BALANCE = "RESPONSE_CELL_BALANCE"
-    RESPONSE_ALARM = "RESPONSE_ALARM"
-    RESPONSE_SETTINGS = "RESPONSE_SETTINGS"
-
     # command bytes [Priority=18][Command=94][BMS ID=01][Uplink ID=40]
-    CAN_FRAMES = {
-        COMMAND_BASE: [0x18940140],
-        COMMAND_SOC: [0x18900140],
-        COMMAND_MINMAX_CELL_VOLTS: [0x18910140],
-        COMMAND_MINMAX_TEMP: [0x18920140],
-        COMMAND_FET: [0x18930140],
-        COMMAND_STATUS: [0x18940140],
-        COMMAND_CELL_VOLTS: [0x18950140],
-        COMMAND_TEMP: [0x18960140],
-        COMMAND_CELL_BALANCE: [0x18970140],
-        COMMAND_ALARM: [0x18980140],
-        COMMAND_SETTINGS: [0x18500140],
-        RESPONSE_BASE: [0x18944001],
-        RESPONSE_SOC: [0x18904001],
-        RESPONSE_MINMAX_CELL_VOLTS: [0x18914001],
-        RESPONSE_MINMAX_TEMP: [0x18924001],
-        RESPONSE_FET: [0x18934001],
-        RESPONSE_STATUS: [0x18944001],
-        RESPONSE_CELL_VOLTS: [0x18954001],
-        RESPONSE_TEMP: [0x18964001],
-        RESPONSE_CELL_BALANCE: [0x18974001],
-        RESPONSE_ALARM: [0x18984001],
-        RESPONSE_SETTINGS: [0x18504001],
-    }
+    COMMAND_BASE = 0x18940140
+    COMMAND_SOC = 0x18900140
+    COMMAND_MINMAX_CELL_VOLTS = 0x18910140
+    COMMAND_MINMAX_TEMP = 0x18920140
+    COMMAND_FET = 0x18930140
+    COMMAND_STATUS = 0x18940140
+    COMMAND_CELL_VOLTS = 0x18950140
+    COMMAND_TEMP = 0x18960140
+    COMMAND_CELL_BALANCE = 0x18970140
+    COMMAND_ALARM = 0x18980140
+    COMMAND_SETTINGS = 0x18500140
+
+    # response bytes [Priority=18][Command=94][Uplink ID=40][BMS ID=01]
+    RESPONSE_BASE = 0x18944001
+    RESPONSE_SOC = 0x18904001
+    RESPONSE_MINMAX_CELL_VOLTS = 0x18914001
+    RESPONSE_MINMAX_TEMP = 0x18924001
+    RESPONSE_FET = 0x18934001
+    RESPONSE_STATUS = 0x18944001
+    RESPONSE_CELL_VOLTS = 0x18954001
+    RESPONSE_TEMP = 0x18964001
+    RESPONSE_CELL_BALANCE = 0x18974001
+    RESPONSE_ALARM = 0x18984001
+    RESPONSE_SETTINGS = 0x18504001
+
+    # commands sent on every refresh, COMMAND_TEMP is unused
+    REQUEST_COMMANDS = (
+        COMMAND_SOC,
+        COMMAND_MINMAX_CELL_VOLTS,
+        COMMAND_MINMAX_TEMP,
+        COMMAND_FET,
+        COMMAND_STATUS,
+        COMMAND_CELL_VOLTS,
+        COMMAND_CELL_BALANCE,
+        COMMAND_ALARM,
+    )
+
+    # responses evaluated by read_daly_can(), except the cell voltages
+    RESPONSE_IDS = (
+        RESPONSE_STATUS,
+        RESPONSE_SOC,
+        RESPONSE_MINMAX_CELL_VOLTS,
+        RESPONSE_MINMAX_TEMP,
+        RESPONSE_FET,
+        RESPONSE_SETTINGS,
+        RESPONSE_ALARM,
+    )
+
+    # max number of cell voltage frames with 3 cells each
+    CELL_VOLTS_FRAMES = 13
+    # range of the cell voltage ids, which are re-keyed with the frame number by the receive thread
+    CELL_VOLTS_ID_MIN = RESPONSE_CELL_VOLTS + 0x100000
+    CELL_VOLTS_ID_MAX = CELL_VOLTS_ID_MIN + (CELL_VOLTS_FRAMES << 16)
 
     BATTERYTYPE = "Daly CAN"
     LENGTH_CHECK = 4
@@ -118,6 +175,12 @@ class Daly_Can(Battery):
         """
         return self.port + ("__" + bytearray_to_string(self.address).replace("\\", "0") if self.address is not None else "")
 
+    def get_can_filters(self) -> List[dict]:
+        """
+        Receive only the response frames of this BMS, which are [Priority=18][Command][Uplink ID=40][BMS ID]
+        """
+        return [{"can_id": 0x18004000 | self.device_address, "can_mask": 0x1F00FFFF, "extended": True}]
+
     def test_connection(self):
         """
         call a function that will connect to the battery, send a command and retrieve the result.
@@ -130,14 +193,7 @@ class Daly_Can(Battery):
             self.get_settings()
             result = self.refresh_data()
         except Exception:
-            (
-                exception_type,
-                exception_object,
-                exception_traceback,
-            ) = sys.exc_info()
-            file = exception_traceback.tb_frame.f_code.co_filename
-            line = exception_traceback.tb_lineno
-            logger.error(f"Exception occurred: {repr(exception_object)} of type {exception_type} in {file} line #{line}")
+            logger.exception("Exception occurred while testing the connection")
             result = False
 
         return result
@@ -152,11 +208,14 @@ class Daly_Can(Battery):
             raise RuntimeError("CAN Interface not initialised")
 
         try:
-            message = Message(arbitration_id=(self.CAN_FRAMES[self.COMMAND_SETTINGS][0] & 0xFFFF00FF) | (self.device_address << 8), data=data)
+            message = Message(arbitration_id=(self.COMMAND_SETTINGS & 0xFFFF00FF) | (self.device_address << 8), data=data)
             self.can_transport_interface.can_bus.send(message, timeout=0.2)
         except CanOperationError:
             logger.error("CAN Bus Error while sending data. Check cabeling")
 
+        # request all data once and wait for the responses, the next requests are sent by refresh_data()
+        self.request_daly_can()
+
         self.capacity = BATTERY_CAPACITY
         sleep(0.1)
 
@@ -170,10 +229,11 @@ class Daly_Can(Battery):
         # Return True if success, False for failure
         self.reset_soc = self.soc if self.soc else 0
 
+        # read the responses to the previous requests from the cache and request the data for the next
+        # iteration afterwards, so the refresh does not wait for the round trip to the BMS
+        result = self.read_daly_can()
         self.request_daly_can()
-        sleep(0.1)
 
-        result = self.read_daly_can()
         self.write_soc()
         if AUTO_RESET_SOC:
             self.update_soc_on_bms()
@@ -181,31 +241,12 @@ class Daly_Can(Battery):
         return result
 
     def request_daly_can(self):
-        data = bytearray(b"\x00\x00\x00\x00\x00\x00\x00\x00")
-
         if self.can_transport_interface.can_bus is None:
             raise RuntimeError("CAN Interface not initialised")
 
         try:
-            message = Message(arbitration_id=(self.CAN_FRAMES[self.COMMAND_SOC][0] & 0xFFFF00FF) | (self.device_address << 8), data=data)
-            self.can_transport_interface.can_bus.send(message, timeout=0.2)
-            message = Message(arbitration_id=(self.CAN_FRAMES[self.COMMAND_MINMAX_CELL_VOLTS][0] & 0xFFFF00FF) | (self.device_address << 8), data=data)
-            self.can_transport_interface.can_bus.send(message, timeout=0.2)
-            message = Message(arbitration_id=(self.CAN_FRAMES[self.COMMAND_MINMAX_TEMP][0] & 0xFFFF00FF) | (self.device_address << 8), data=data)
-            self.can_transport_interface.can_bus.send(message, timeout=0.2)
-            message = Message(arbitration_id=(self.CAN_FRAMES[self.COMMAND_FET][0] & 0xFFFF00FF) | (self.device_address << 8), data=data)
-            self.can_transport_interface.can_bus.send(message, timeout=0.2)
-            message = Message(arbitration_id=(self.CAN_FRAMES[self.COMMAND_STATUS][0] & 0xFFFF00FF) | (self.device_address << 8), data=data)
-            self.can_transport_interface.can_bus.send(message, timeout=0.2)
-            message = Message(arbitration_id=(self.CAN_FRAMES[self.COMMAND_CELL_VOLTS][0] & 0xFFFF00FF) | (self.device_address << 8), data=data)
-            self.can_transport_interface.can_bus.send(message, timeout=0.2)
-            # unused
-            # message = Message(arbitration_id=(self.CAN_FRAMES[self.COMMAND_TEMP][0] & 0xffff00ff) | (self.device_address << 8), data=data)
-            # self.can_transport_interface.can_bus.send(message, timeout=0.2)
-            message = Message(arbitration_id=(self.CAN_FRAMES[self.COMMAND_CELL_BALANCE][0] & 0xFFFF00FF) | (self.device_address << 8), data=data)
-            self.can_transport_interface.can_bus.send(message, timeout=0.2)
-            message = Message(arbitration_id=(self.CAN_FRAMES[self.COMMAND_ALARM][0] & 0xFFFF00FF) | (self.device_address << 8), data=data)
-            self.can_transport_interface.can_bus.send(message, timeout=0.2)
+            for message in self.request_messages:
+                self.can_transport_interface.can_bus.send(message, timeout=0.2)
         except CanOperationError:
             logger.error("CAN Bus Error while sending data. Check cabeling")
 
@@ -219,17 +260,20 @@ class Daly_Can(Battery):
 
             # check if all needed data is available
             data_check = 0
+            # payloads of the cell voltage frames
+            cell_frames = []
 
-            # CONSTANTS
-            crntMinValid = -(MAX_BATTERY_DISCHARGE_CURRENT * 2.1)
-            crntMaxValid = MAX_BATTERY_CHARGE_CURRENT * 1.3
+            cache = self.can_transport_interface.can_message_cache_callback()
+            if not cache:
+                get_connection_error_message(self.online)
+                return False
 
-            for frame_id, data in self.can_transport_interface.can_message_cache_callback().items():
-                if frame_id & 0xFF != self.device_address:  # check if id byte is matching
+            for frame_id, data in cache.items():
+                normalized_arbitration_id = self.response_ids.get(frame_id)
+                if normalized_arbitration_id is None:  # frame of another device or not needed
                     continue
-                normalized_arbitration_id = (frame_id & 0xFFFFFF00) + 1
                 # Status data
-                if normalized_arbitration_id in self.CAN_FRAMES[self.RESPONSE_STATUS]:
+                if normalized_arbitration_id == self.RESPONSE_STATUS:
                     (
                         self.cell_count,
                         temperature_sensors,
@@ -237,65 +281,45 @@ class Daly_Can(Battery):
                         self.load_connected,
                         state,
                         self.history.charge_cycles,
-                    ) = unpack_from(">BB??BHx", data)
+                    ) = _S_STATUS.unpack_from(data)
 
                     if self.cell_count != 0:
                         # check if all needed data is available
                         data_check += 1
 
                 # SOC data
-                elif normalized_arbitration_id in self.CAN_FRAMES[self.RESPONSE_SOC]:
+                elif normalized_arbitration_id == self.RESPONSE_SOC:
 
-                    voltage, tmp, current, soc = unpack_from(">HHHH", data)
+                    voltage, tmp, current, soc = _S_SOC.unpack_from(data)
                     current = (current - self.CURRENT_ZERO_CONSTANT) / -10 * INVERT_CURRENT_MEASUREMENT
                     # logger.info("voltage: " + str(voltage) + ", current: " + str(current) + ", soc: " + str(soc))
-                    if crntMinValid < current < crntMaxValid:
+                    if _CRNT_MIN_VALID < current < _CRNT_MAX_VALID:
                         self.voltage = voltage / 10
                         self.current = current
                         self.soc = soc / 10
 
                         # check if all needed data is available
                         data_check += 1
+                    else:
+                        # do not retry, keep the last valid values until the next refresh
+                        logger.debug("Daly CAN: current %.1f A out of valid range, ignoring SOC frame", current)
 
                 # Cell voltage data
                 # as daly sends all frames with the same ID, the receive thread must encode the frame id (from the data field) into the
-                # arbitration id to make it unique to be able to store it in a map. here we mask the frame number out so we can
-                # compare it with the original message id
-                elif (
-                    normalized_arbitration_id > self.CAN_FRAMES[self.RESPONSE_CELL_VOLTS][0] + 0x100000
-                    and normalized_arbitration_id <= self.CAN_FRAMES[self.RESPONSE_CELL_VOLTS][0] + 0x1D0000
-                ):
-                    if self.cell_count is not None:
-
-                        frameCell = [0, 0, 0]
-                        lowMin = MIN_CELL_VOLTAGE / 2
-                        frame = 0
-                        bufIdx = 0
-
-                        if len(self.cells) != self.cell_count:
-                            # init the numbers of cells
-                            self.cells = []
-                            for idx in range(self.cell_count):
-                                self.cells.append(Cell(True))
-
-                        while bufIdx < len(data):
-                            frame, frameCell[0], frameCell[1], frameCell[2] = unpack_from(">BHHHx", data, bufIdx)
-                            for idx in range(3):
-                                cellnum = ((frame - 1) * 3) + idx  # daly is 1 based, driver 0 based
-                                if cellnum >= self.cell_count:
-                                    break
-                                cellVoltage = frameCell[idx] / 1000
-                                self.cells[cellnum].voltage = None if cellVoltage < lowMin else cellVoltage
-                            bufIdx += 8
+                # arbitration id to make it unique to be able to store it in a map. the re-keyed ids of all frames are mapped
+                # by self.response_ids, so here only the range of the frame numbers is checked
+                elif self.CELL_VOLTS_ID_MIN < normalized_arbitration_id <= self.CELL_VOLTS_ID_MAX:
+                    # collect the frames and decode them all at once after the loop
+                    cell_frames.append(data)
 
                 # Cell voltage range data
-                elif normalized_arbitration_id in self.CAN_FRAMES[self.RESPONSE_MINMAX_CELL_VOLTS]:
+                elif normalized_arbitration_id == self.RESPONSE_MINMAX_CELL_VOLTS:
                     (
                         cell_max_voltage,
                         self.cell_max_no,
                         cell_min_voltage,
                         self.cell_min_no,
-                    ) = unpack_from(">hbhb", data)
+                    ) = _S_MINMAX_V.unpack_from(data)
                     # Daly cells numbers are 1 based and not 0 based
                     self.cell_min_no -= 1
                     self.cell_max_no -= 1
@@ -304,9 +328,13 @@ class Daly_Can(Battery):
                     self.cell_min_voltage = cell_min_voltage / 1000
 
                 # Temperature range data
-                elif normalized_arbitration_id in self.CAN_FRAMES[self.RESPONSE_MINMAX_TEMP]:
+                elif normalized_arbitration_id == self.RESPONSE_MINMAX_TEMP:
 
-                    max_temp, max_no, min_temp, min_no = unpack_from(">BBBB", data)
+                    # single byte fields, indexing is cheaper than unpacking
+                    max_temp = data[0]
+                    max_no = data[1]
+                    min_temp = data[2]
+                    min_no = data[3]
 
                     # store temperatures in a dict to assign the temperature to the correct sensor
                     temperatures = {min_no: (min_temp - self.TEMP_ZERO_CONSTANT), max_no: (max_temp - self.TEMP_ZERO_CONSTANT)}
@@ -315,153 +343,70 @@ class Daly_Can(Battery):
                     self.to_temperature(2, temperatures[max_no])
 
                 # FET data
-                elif normalized_arbitration_id in self.CAN_FRAMES[self.RESPONSE_FET]:
+                elif normalized_arbitration_id == self.RESPONSE_FET:
                     (
                         status,
                         self.charge_fet,
                         self.discharge_fet,
                         self.history.charge_cycles,
                         capacity_remain,
-                    ) = unpack_from(">b??BL", data)
+                    ) = _S_FET.unpack_from(data)
                     self.capacity_remain = capacity_remain / 1000
 
                 # Settings data
-                elif normalized_arbitration_id in self.CAN_FRAMES[self.RESPONSE_SETTINGS]:
+                elif normalized_arbitration_id == self.RESPONSE_SETTINGS:
                     (
                         capacity,
                         nominalVoltage,
-                    ) = unpack_from(">LL", data)
+                    ) = _S_SETTINGS.unpack_from(data)
                     self.capacity = capacity / 1000
 
                 # Alarm data
-                elif normalized_arbitration_id in self.CAN_FRAMES[self.RESPONSE_ALARM]:
-                    (
-                        al_volt,
-                        al_temp,
-                        al_crnt_soc,
-                        al_diff,
-                        al_mos,
-                        al_misc1,
-                        al_misc2,
-                        al_fault,
-                    ) = unpack_from(">BBBBBBBB", data)
-
-                    if al_volt & 48:
-                        # High voltage levels - Alarm
-                        self.protection.high_voltage = 2
-                    elif al_volt & 15:
-                        # High voltage Warning levels - Pre-alarm
-                        self.protection.high_voltage = 1
-                    else:
-                        self.protection.high_voltage = 0
-
-                    if al_volt & 128:
-                        # Low voltage level - Alarm
-                        self.protection.low_voltage = 2
-                    elif al_volt & 64:
-                        # Low voltage Warning level - Pre-alarm
-                        self.protection.low_voltage = 1
-                    else:
-                        self.protection.low_voltage = 0
-
-                    if al_temp & 2:
-                        # High charge temp - Alarm
-                        self.protection.high_charge_temperature = 2
-                    elif al_temp & 1:
-                        # High charge temp - Pre-alarm
-                        self.protection.high_charge_temperature = 1
-                    else:
-                        self.protection.high_charge_temperature = 0
-
-                    if al_temp & 8:
-                        # Low charge temp - Alarm
-                        self.protection.low_charge_temperature = 2
-                    elif al_temp & 4:
-                        # Low charge temp - Pre-alarm
-                        self.protection.low_charge_temperature = 1
-                    else:
-                        self.protection.low_charge_temperature = 0
-
-                    if al_temp & 32:
-                        # High discharge temp - Alarm
-                        self.protection.high_temperature = 2
-                    elif al_temp & 16:
-                        # High discharge temp - Pre-alarm
-                        self.protection.high_temperature = 1
-                    else:
-                        self.protection.high_temperature = 0
-
-                    if al_temp & 128:
-                        # Low discharge temp - Alarm
-                        self.protection.low_temperature = 2
-                    elif al_temp & 64:
-                        # Low discharge temp - Pre-alarm
-                        self.protection.low_temperature = 1
-                    else:
-                        self.protection.low_temperature = 0
-
-                    # if al_crnt_soc & 2:
-                    #    # High charge current - Alarm
-                    #    self.protection.high_charge_current = 2
-                    # elif al_crnt_soc & 1:
-                    #    # High charge current - Pre-alarm
-                    #    self.protection.high_charge_current = 1
-                    # else:
-                    #    self.protection.high_charge_current = 0
-
-                    # if al_crnt_soc & 8:
-                    #    # High discharge current - Alarm
-                    #    self.protection.high_charge_current = 2
-                    # elif al_crnt_soc & 4:
-                    #    # High discharge current - Pre-alarm
-                    #    self.protection.high_charge_current = 1
-                    # else:
-                    #    self.protection.high_charge_current = 0
-
-                    if al_crnt_soc & 2 or al_crnt_soc & 8:
-                        # High charge/discharge current - Alarm
-                        self.protection.high_charge_current = 2
-                    elif al_crnt_soc & 1 or al_crnt_soc & 4:
-                        # High charge/discharge current - Pre-alarm
-                        self.protection.high_charge_current = 1
-                    else:
-                        self.protection.high_charge_current = 0
-
-                    if al_crnt_soc & 128:
-                        # Low SoC - Alarm
-                        self.protection.low_soc = 2
-                    elif al_crnt_soc & 64:
-                        # Low SoC Warning level - Pre-alarm
-                        self.protection.low_soc = 1
-                    else:
-                        self.protection.low_soc = 0
-
-            self.hardware_version = "Daly CAN " + str(self.cell_count) + "S"
+                elif normalized_arbitration_id == self.RESPONSE_ALARM:
+                    # single byte fields, only voltage, temperature and current/SoC are used
+                    # byte 3 to 7: cell difference, MOSFET, misc 1, misc 2 and fault alarms
+                    al_volt = data[0]
+                    al_temp = data[1]
+                    al_crnt_soc = data[2]
+
+                    self.protection.high_voltage = _LUT_HIGH_VOLTAGE[al_volt]
+                    self.protection.low_voltage = _LUT_LOW_VOLTAGE[al_volt]
+                    self.protection.high_charge_temperature = _LUT_HIGH_CHARGE_TEMP[al_temp]
+                    self.protection.low_charge_temperature = _LUT_LOW_CHARGE_TEMP[al_temp]
+                    self.protection.high_temperature = _LUT_HIGH_DISCHARGE_TEMP[al_temp]
+                    self.protection.low_temperature = _LUT_LOW_DISCHARGE_TEMP[al_temp]
+                    self.protection.high_charge_current = _LUT_HIGH_CURRENT[al_crnt_soc]
+                    self.protection.low_soc = _LUT_LOW_SOC[al_crnt_soc]
+
+            if cell_frames and self.cell_count is not None:
+                # init the numbers of cells, keep the existing cells and only add or remove the difference
+                if len(self.cells) < self.cell_count:
+                    self.cells.extend(Cell(True) for _ in range(self.cell_count - len(self.cells)))
+                elif len(self.cells) > self.cell_count:
+                    del self.cells[self.cell_count :]
+
+                for frame, *frameCells in _S_CELL.iter_unpack(b"".join(cell_frames)):
+                    cellnum = (frame - 1) * 3  # daly is 1 based, driver 0 based
+                    for cellMv in frameCells:
+                        if cellnum >= self.cell_count:
+                            break
+                        self.cells[cellnum].voltage = None if cellMv < _CELL_LOW_MIN_MV else cellMv / 1000
+                        cellnum += 1
+
+            # the cell count rarely changes, so rebuild the string only if needed
+            if self.cell_count != self.hardware_version_cell_count:
+                self.hardware_version = "Daly CAN " + str(self.cell_count) + "S"
+                self.hardware_version_cell_count = self.cell_count
 
             # check if all needed data is available
             # sum of all data checks except for alarms
-            logger.debug("Data check: %d" % (data_check))
+            logger.debug("Data check: %d", data_check)
             if data_check == 0:
                 get_connection_error_message(self.online)
                 return False
 
             return True
 
-            # TODO handle errors?
-            """
-            can_filters = [
-                {"can_id": self.response_base, "can_mask": 0xFFFFFFF},
-                {"can_id": self.response_soc, "can_mask": 0xFFFFFFF},
-                {"can_id": self.response_minmax_cell_volts, "can_mask": 0xFFFFFFF},
-                {"can_id": self.response_minmax_temp, "can_mask": 0xFFFFFFF},
-                {"can_id": self.response_fet, "can_mask": 0xFFFFFFF},
-                {"can_id": self.response_status, "can_mask": 0xFFFFFFF},
-                {"can_id": self.response_cell_volts, "can_mask": 0xFFFFFFF},
-                {"can_id": self.response_temp, "can_mask": 0xFFFFFFF},
-                {"can_id": self.response_cell_balance, "can_mask": 0xFFFFFFF},
-                {"can_id": self.response_alarm, "can_mask": 0xFFFFFFF},
-            ]
-            """
         except Exception:
             (
                 exception_type,
@@ -489,7 +434,7 @@ class Daly_Can(Battery):
             return False
 
         data = bytearray(8)
-        pack_into(">Hxxxxxx", data, 0, self.soc_to_set * 10)
+        _S_WRITE_SOC.pack_into(data, 0, self.soc_to_set * 10)
 
         message = Message(arbitration_id=(0x161E0080 | (self.device_address << 8)), data=data)
         self.can_transport_interface.can_bus.send(message, timeout=0.2)
@@ -427,6 +427,11 @@ def main():
             can_thread.setup_can(channel=port, bitrate=busspeed, force=True)
             sleep(2)
 
+        # let the kernel drop all frames not needed, if every found battery provides its CAN filters
+        can_filters = [battery[address].get_can_filters() for address in battery]
+        if len(can_filters) > 0 and None not in can_filters:
+            can_thread.set_filters([can_filter for battery_filters in can_filters for can_filter in battery_filters])
+
     # SERIAL
     else:
         # check if BMS_TYPE is not empty and all BMS types in the list are supported
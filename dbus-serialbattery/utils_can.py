@@ -102,7 +102,8 @@ class CanReceiverThread(threading.Thread):
                             self.message_cache[message.arbitration_id] = message.data
                             self._last_received_time[message.arbitration_id] = last_message_time_stamp  # update last received time
 
-                        logger.debug(f"[{self.channel}] Received: ID={hex(message.arbitration_id)}, Daten={message.data}")
+                        # called for every frame, so let logging format the message only if it is shown
+                        logger.debug("[%s] Received: ID=%#x, Daten=%s", self.channel, message.arbitration_id, message.data)
 
                 except can.exceptions.CanOperationError as e:
                     logger.debug(f"CAN Bus {self.channel}: {e}")
@@ -142,7 +143,7 @@ class CanReceiverThread(threading.Thread):
                 if self._current_time - self._last_received_time[arb_id] > 5:
                     del self.message_cache[arb_id]
                     del self._last_received_time[arb_id]
-                    logger.debug(f"[{self.channel}] Cleared cache for arbitration ID {hex(arb_id)} due to timeout")
+                    logger.debug("[%s] Cleared cache for arbitration ID %#x due to timeout", self.channel, arb_id)
 
     def stop(self) -> None:
         """
@@ -162,6 +163,17 @@ class CanReceiverThread(threading.Thread):
             logger.info(f"Bringing down CAN interface {self.channel}")
             subprocess.run(["ip", "link", "set", f"{self.channel}", "down"], capture_output=True, text=True, check=True)
 
+    def set_filters(self, can_filters: list) -> None:
+        """
+        Apply CAN filters to the bus, so that frames not matching are already dropped by the kernel
+
+        :param can_filters: list of python-can filter dicts, None to receive all frames
+        :return: None
+        """
+        if self.can_bus is not None:
+            self.can_bus.set_filters(can_filters)
+            logger.debug(f"[{self.channel}] Applied CAN filters: {can_filters}")
+
     def get_message_cache(self) -> dict:
         """
         Get the current cache of received CAN messages
@@ -36,7 +36,7 @@ import struct  # noqa: E402
 
 # -------------------------------------------------------------------------------------
 # The driver daly_can.py defines these command -> response arbitration IDs:
-# (See the CAN_FRAMES dictionary in daly_can.py)
+# (See the COMMAND_* and RESPONSE_* class constants in daly_can.py)
 #
 # COMMAND_SOC                -> 0x18900140
 # RESPONSE_SOC               -> 0x18904001